@@ -1,66 +1,261 @@
 import os
+import sys
+import json
+import atexit
+import logging
 import time
 import random
+import signal
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from typing import Set, Optional
-import pytz
+from itertools import islice
+from logging.handlers import MemoryHandler
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
 from instagrapi import Client
+from instagrapi.types import Media, UserShort
 from instagrapi.exceptions import (
     LoginRequired, ChallengeRequired,
-    ClientError, ClientConnectionError, BadPassword
+    ClientError, ClientConnectionError, ClientBadRequestError, BadPassword
 )
 
+# Console output is buffered and written every 100 records, or immediately on errors
+logger = logging.getLogger("botify")
+logger.setLevel(logging.INFO)
+_console = logging.StreamHandler(sys.stdout)
+_console.setFormatter(logging.Formatter("%(message)s"))
+_log_buffer = MemoryHandler(capacity=100, flushLevel=logging.ERROR, target=_console)
+logger.addHandler(_log_buffer)
+
+class LRUSet:
+    """Set with a fixed capacity that evicts the least recently used id when full."""
+    
+    def __init__(self, maxsize: int, items: Iterable[str] = ()):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[str, None]" = OrderedDict()
+        for item in items:
+            self.add(item)
+    
+    def __contains__(self, item: str) -> bool:
+        if item not in self._items:
+            return False
+        self._items.move_to_end(item)
+        return True
+    
+    def __len__(self) -> int:
+        return len(self._items)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._items)  # Least recently used first
+    
+    def add(self, item: str) -> None:
+        self._items[item] = None
+        self._items.move_to_end(item)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+class TokenBucket:
+    """Thread-safe token bucket that paces calls to a single API endpoint with random jitter."""
+    
+    def __init__(self, rate: float, capacity: int, jitter: float = 0.0):
+        self.rate = rate  # Tokens refilled per second
+        self.capacity = capacity
+        self.jitter = jitter  # Max random extra seconds added to each call's spacing
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+    
+    def acquire(self) -> None:
+        """Take a token, blocking only while this endpoint's bucket is empty"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve a token even if it has not been refilled yet, plus a random share of
+            # the next one so calls never fall into a fixed, machine-like cadence
+            self._tokens -= 1 + self._rng.uniform(0, self.jitter) * self.rate
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
 class InstagramBot:
     """Instagram automation client for story viewing and feed engagement."""
     
+    SESSION_FILE = "session.json"  # Saved instagrapi session (cookies, device ids)
+    CYCLE_INTERVAL = 1800  # Seconds between the starts of consecutive cycles
+    FOLLOWING_PAGE_SIZE = 50  # Followed users fetched per pagination request
+    MEDIA_PAGE_SIZE = 20  # Posts fetched per feed pagination request
+    STORY_FETCH_WORKERS = 6  # Threads fetching stories; more tends to trigger 429s
+    STORY_LIKE_RATIO = 0.7  # Share of viewed stories that get liked
+    SEEN_BATCH_SIZE = 20  # Stories marked as seen per request
+    TRACKER_FILES = {
+        'viewed_stories': "viewed_stories.txt",
+        'liked_posts': "liked_posts.txt",
+        'commented_posts': "commented_posts.txt"
+    }
+    TRACKER_FLUSH_EVERY = 20  # Tracker writes buffered before flushing to disk
+    TRACKER_MAXSIZE = 10_000  # Most recent ids kept in memory per tracker
+    STORY_FETCHES_FILE = "story_fetches.json"
+    STORY_REFETCH_INTERVAL = 3600  # Seconds before a user's stories are fetched again
+    _TIME_FMT = '%Y-%m-%d %H:%M:%S'
+    _COMMENTS = ("Great content!", "Well done!", "Awesome post!")
+    # endpoint: (requests per second, burst size, max jitter in seconds)
+    # Steady-state spacing is 1/rate + uniform(0, jitter). The action endpoints keep the
+    # old client-wide delay_range of 3-7 s between requests (3 s + up to 4 s of jitter).
+    # Story fetches run on STORY_FETCH_WORKERS threads, so they burst up to that many and
+    # then space out to 2-3 s. Comments are the most heavily policed action and stay at
+    # 20-30 s apart. Logins and session checks are paced like actions. Instagram does not
+    # publish its limits; these are conservative guesses.
+    RATE_LIMITS = {
+        'login': (1 / 3, 1, 4.0),
+        'user_following': (1 / 3, 1, 4.0),
+        'user_stories': (0.5, 6, 1.0),
+        'story_seen': (1 / 3, 1, 4.0),
+        'story_like': (1 / 3, 1, 4.0),
+        'user_medias': (1 / 3, 1, 4.0),
+        'media_like': (1 / 3, 1, 4.0),
+        'media_comment': (0.05, 1, 10.0)
+    }
+    
     def __init__(self):
         self.cl = Client()
-        self.cl.delay_range = [3, 7]  # Human-like interaction delays
+        # Short human-like pause on every request, covering the ones instagrapi makes
+        # internally (login flow, fallbacks); absorbed by bucket spacing for metered calls
+        self.cl.delay_range = [1, 2]
+        self._rng = random.Random()
+        self._stop = threading.Event()  # Set by SIGINT/SIGTERM to end the run loop
         self._init_trackers()
         
-        # Load credentials from environment variables
-        self.credentials = {
-            'username': os.getenv("INSTAGRAM_USERNAME"),
-            'password': os.getenv("INSTAGRAM_PASSWORD")
+        # Independent per-endpoint rate limits, mirroring Instagram's own buckets
+        self._buckets = {
+            endpoint: TokenBucket(rate, burst, jitter)
+            for endpoint, (rate, burst, jitter) in self.RATE_LIMITS.items()
         }
-        if not self.credentials['username'] or not self.credentials['password']:
-            raise ValueError("Instagram credentials not found in environment variables.")
+        
+        self.credentials = self._load_credentials()
         
         self.limits = {
             'likes': 100,
             'comments': 40,
             'story_views': 200
         }
-        self.timezone = pytz.timezone('Asia/Kolkata')
+        self.timezone = ZoneInfo('Asia/Kolkata')
+        
+    @staticmethod
+    def _load_credentials() -> dict:
+        """Load credentials from environment variables"""
+        credentials = {
+            'username': os.getenv("INSTAGRAM_USERNAME"),
+            'password': os.getenv("INSTAGRAM_PASSWORD")
+        }
+        if not credentials['username'] or not credentials['password']:
+            raise ValueError("Instagram credentials not found in environment variables.")
+        return credentials
+    
+    def _reload_credentials(self) -> None:
+        """Pick up rotated credentials before re-authenticating"""
+        try:
+            self.credentials = self._load_credentials()
+        except ValueError as e:
+            logger.warning("%s Keeping the current credentials.", e)
         
     def _init_trackers(self) -> None:
         """Initialize interaction trackers to prevent duplicates"""
-        self.viewed_stories: Set[str] = set()
-        self.liked_posts: Set[str] = set()
-        self.commented_posts: Set[str] = set()
+        self.viewed_stories = self._load_set(self.TRACKER_FILES['viewed_stories'])
+        self.liked_posts = self._load_set(self.TRACKER_FILES['liked_posts'])
+        self.commented_posts = self._load_set(self.TRACKER_FILES['commented_posts'])
+        self._seen_batch: List[Tuple[str, str, bool]] = []  # (story id, user pk, like)
+        self._checked_users: List[str] = []  # Users whose queued stories await a flush
+        self._rejected_users: Set[str] = set()  # Users with a story Instagram refused as seen
+        
+        # Append-only tracker files, opened once and flushed in batches
+        self._tracker_files = {
+            tracker: open(path, "a") for tracker, path in self.TRACKER_FILES.items()
+        }
+        self._pending_writes = 0
+        atexit.register(self._flush_trackers)
+        
+        # When each followed user's stories were last fetched, by user pk
+        self._story_fetches: Dict[str, float] = self._load_story_fetches()
+        atexit.register(self._save_story_fetches)
+        
+    def _load_set(self, path: str) -> LRUSet:
+        """Load the most recently processed ids from a tracker file, compacting it"""
+        if not os.path.exists(path):
+            return LRUSet(self.TRACKER_MAXSIZE)
+        with open(path, "r") as file:
+            lines = [line.strip() for line in file if line.strip()]
+        ids = LRUSet(self.TRACKER_MAXSIZE, lines)
+        
+        # Rewrite the file to the ids that survived so it stays bounded like the set
+        if len(lines) > len(ids):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as file:
+                file.writelines(f"{item_id}\n" for item_id in ids)
+            os.replace(tmp_path, path)
+        return ids
+    
+    def _track(self, tracker: str, item_id: str) -> None:
+        """Record a processed id in memory and in its tracker file"""
+        getattr(self, tracker).add(item_id)
+        self._tracker_files[tracker].write(f"{item_id}\n")
+        self._pending_writes += 1
+        if self._pending_writes >= self.TRACKER_FLUSH_EVERY:
+            self._flush_trackers()
+    
+    def _load_story_fetches(self) -> Dict[str, float]:
+        """Load story fetch times that are still within the refetch interval"""
+        if not os.path.exists(self.STORY_FETCHES_FILE):
+            return {}
+        try:
+            with open(self.STORY_FETCHES_FILE, "r") as file:
+                fetches = json.load(file)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable %s: %s", self.STORY_FETCHES_FILE, e)
+            return {}
+        cutoff = time.time() - self.STORY_REFETCH_INTERVAL
+        return {pk: fetched for pk, fetched in fetches.items() if fetched > cutoff}
+    
+    def _save_story_fetches(self) -> None:
+        """Write recent story fetch times to disk, dropping expired entries"""
+        cutoff = time.time() - self.STORY_REFETCH_INTERVAL
+        self._story_fetches = {
+            pk: fetched for pk, fetched in self._story_fetches.items() if fetched > cutoff
+        }
+        with open(self.STORY_FETCHES_FILE, "w") as file:
+            json.dump(self._story_fetches, file)
+    
+    def _flush_trackers(self) -> None:
+        """Write buffered tracker ids to disk"""
+        for file in self._tracker_files.values():
+            file.flush()
+        self._pending_writes = 0
         
     @staticmethod
     def safe_action(func):
-        """Decorator for error handling and rate limiting"""
+        """Decorator for error handling and retries"""
         def wrapper(self, *args, **kwargs):
             try:
-                result = func(self, *args, **kwargs)
-                time.sleep(random.uniform(1.2, 3.8))  # Simulate human-like delays
-                return result
-            except (ClientError, ClientConnectionError) as e:
-                print(f"Network error: {e}")
-                self._handle_retry()
+                return func(self, *args, **kwargs)
             except ChallengeRequired:
-                print("Manual verification required. Please check your Instagram app.")
+                logger.warning("Manual verification required. Please check your Instagram app.")
                 self._handle_challenge()
             except LoginRequired:
-                print("Re-authenticating...")
+                logger.info("Re-authenticating...")
+                self._reload_credentials()
                 self.authenticate()
             except BadPassword:
-                print("Invalid credentials or suspicious login detected. Exiting.")
+                logger.error("Invalid credentials or suspicious login detected. Exiting.")
                 exit(1)
+            except (ClientError, ClientConnectionError) as e:
+                # After the auth errors above, which are ClientError subclasses too
+                logger.warning("Network error: %s", e)
+                self._handle_retry()
             except Exception as e:
-                print(f"Unexpected error: {e}")
+                logger.error("Unexpected error: %s", e)
                 self._handle_retry()
             return None
         return wrapper
@@ -68,118 +263,264 @@ class InstagramBot:
     def _handle_retry(self, delay: Optional[int] = None) -> None:
         """Handle retry logic for temporary errors"""
         if delay is None:
-            delay = random.randint(600, 1200)  # Default delay: 10-20 minutes
-        print(f"Temporary issue detected. Retrying in {delay // 60} minutes.")
-        time.sleep(delay)
+            delay = self._rng.randint(600, 1200)  # Default delay: 10-20 minutes
+        logger.warning("Temporary issue detected. Retrying in %d minutes.", delay // 60)
+        _log_buffer.flush()
+        self._stop.wait(delay)
     
     def _handle_challenge(self) -> None:
         """Handle Instagram's challenge requirement (e.g., manual verification)"""
-        print("Please complete the challenge in the Instagram app.")
-        time.sleep(300)  # Wait 5 minutes for the user to complete the challenge
-        self.authenticate()
+        logger.warning("Please complete the challenge in the Instagram app.")
+        _log_buffer.flush()
+        # Wait 5 minutes for the user to complete the challenge
+        if not self._stop.wait(300):
+            self.authenticate()
+    
+    def _restore_session(self) -> bool:
+        """Reuse a saved session instead of a fresh login; False if a login is needed"""
+        if not os.path.exists(self.SESSION_FILE):
+            return False
+        try:
+            self.cl.load_settings(self.SESSION_FILE)
+            self.cl.login(**self.credentials)  # No-op for a loaded session
+            self._call('login', self.cl.get_timeline_feed)  # Confirms the session is still valid
+            return True
+        except (LoginRequired, ValueError) as e:
+            logger.info("Saved session is no longer usable (%s), logging in again.", e)
+            # Start a clean session but keep the device ids Instagram already knows
+            uuids = self.cl.get_settings().get("uuids", {})
+            self.cl.set_settings({})
+            self.cl.set_uuids(uuids)
+            os.remove(self.SESSION_FILE)
+            return False
     
     def authenticate(self) -> None:
         """Handle secure authentication with credentials"""
         try:
-            print("Initiating secure authentication...")
-            self.cl.login(**self.credentials)
-            print("Authentication successful.")
+            logger.info("Initiating secure authentication...")
+            if self._restore_session():
+                logger.info("Restored saved session.")
+            else:
+                self._call('login', self.cl.login, **self.credentials)
+                logger.info("Authentication successful.")
+            self.cl.dump_settings(self.SESSION_FILE)
         except ChallengeRequired:
-            print("Account verification required. Please check your Instagram app.")
+            logger.warning("Account verification required. Please check your Instagram app.")
             self._handle_challenge()
         except BadPassword:
-            print("Invalid credentials or suspicious login detected. Exiting.")
+            logger.error("Invalid credentials or suspicious login detected. Exiting.")
             exit(1)
         except Exception as e:
-            print(f"Authentication failed: {e}")
+            logger.error("Authentication failed: %s", e)
             self._handle_retry()
             
-    def _within_limit(self, action: str, count: int) -> bool:
-        """Check if action count is within daily limits"""
-        return count < self.limits.get(action, 0)
+    def _call(self, endpoint: str, method, *args, **kwargs):
+        """Call a client method once its endpoint's rate limit allows it"""
+        self._buckets[endpoint].acquire()
+        return method(*args, **kwargs)
+    
+    def _iter_following(self) -> Iterator[UserShort]:
+        """Yield followed users page by page, fetching the next page only when needed"""
+        next_max_id = ""
+        while True:
+            users, next_max_id = self._call(
+                'user_following', self.cl.user_following_v1_chunk, self.cl.user_id,
+                max_amount=self.FOLLOWING_PAGE_SIZE, max_id=next_max_id
+            )
+            yield from users
+            if not next_max_id:
+                break
+    
+    def _iter_medias(self, amount: int) -> Iterator[Media]:
+        """Yield up to `amount` posts page by page, fetching the next page only when needed"""
+        end_cursor = ""
+        while amount > 0:
+            medias, end_cursor = self._call(
+                'user_medias', self.cl.user_medias_paginated_v1, self.cl.user_id,
+                amount=min(self.MEDIA_PAGE_SIZE, amount), end_cursor=end_cursor
+            )
+            yield from medias
+            amount -= len(medias)
+            if not medias or not end_cursor:
+                break
+    
+    def _flush_seen(self) -> None:
+        """Mark queued stories as seen, then track and like the ones Instagram accepted"""
+        batch, self._seen_batch = self._seen_batch, []
+        if batch:
+            try:
+                # Full '<pk>_<user_id>' ids, so instagrapi doesn't look up each story's owner
+                self._call('story_seen', self.cl.story_seen, [story_id for story_id, _, _ in batch])
+                seen = batch
+            except ClientBadRequestError as e:
+                # Only a rejected request is worth splitting up; auth and network errors propagate
+                logger.warning("Batch story_seen rejected (%s), retrying individually.", e)
+                seen = []
+                for entry in batch:
+                    try:
+                        self._call('story_seen', self.cl.story_seen, [entry[0]])
+                        seen.append(entry)
+                    except ClientBadRequestError as e:
+                        logger.warning("Error marking story %s as seen: %s", entry[0], e)
+                        self._rejected_users.add(entry[1])  # Retry this user next cycle
+            
+            for story_id, _, _ in seen:
+                self._track('viewed_stories', story_id)
+            for story_id, _, like in seen:
+                if not like:
+                    continue
+                try:
+                    self._call('story_like', self.cl.story_like, story_id)
+                except (LoginRequired, ChallengeRequired, ClientConnectionError):
+                    raise  # Handled by safe_action
+                except Exception as e:
+                    logger.warning("Error liking story %s: %s", story_id, e)
+        
+        # Users whose new stories were all queued, and all accepted, are fully handled
+        checked_at = time.time()
+        for user_pk in self._checked_users:
+            if user_pk not in self._rejected_users:
+                self._story_fetches[user_pk] = checked_at
+        self._checked_users = []
     
     @safe_action
     def handle_stories(self) -> None:
         """Process stories from followed accounts with duplicate prevention"""
-        following = self.cl.user_following(self.cl.user_id)
+        following = self._iter_following()
+        story_limit = self.limits['story_views']
         story_count = 0
         
-        for user in following.values():
-            if story_count >= self.limits['story_views']:
-                break
-                
+        # Stories are fetched in parallel; seen/like calls stay on this thread
+        with ThreadPoolExecutor(max_workers=self.STORY_FETCH_WORKERS) as pool:
             try:
-                stories = self.cl.user_stories(user.pk)
-                for story in stories:
-                    if story.id in self.viewed_stories:
-                        continue
-                        
-                    self.cl.story_seen([story.pk])
-                    self.viewed_stories.add(story.id)
-                    
-                    if random.random() < 0.7:  # 70% chance to like the story
-                        self.cl.story_like(story.id)
+                while story_count < story_limit and not self._stop.is_set():
+                    page = list(islice(following, self.FOLLOWING_PAGE_SIZE))
+                    if not page:
+                        break
+                    # Skip users fetched recently; their stories were already handled
+                    cutoff = time.time() - self.STORY_REFETCH_INTERVAL
+                    users = [user for user in page if self._story_fetches.get(user.pk, 0) <= cutoff]
+                    futures = {
+                        pool.submit(self._call, 'user_stories', self.cl.user_stories, user.pk): user
+                        for user in users
+                    }
                     
-                    story_count += 1
-                    print(f"Processed story by {user.username}")
+                    for future in as_completed(futures):
+                        if story_count >= story_limit or self._stop.is_set():
+                            break
+                            
+                        user = futures[future]
+                        try:
+                            stories = future.result()
+                            new_stories = [story for story in stories if story.id not in self.viewed_stories]
+                            # Pick the stories to like in one draw instead of a coin flip per story;
+                            # rounding the count randomly keeps the expected rate at STORY_LIKE_RATIO
+                            expected = self.STORY_LIKE_RATIO * len(new_stories)
+                            n_like = int(expected) + (self._rng.random() < expected - int(expected))
+                            like_idx = set(self._rng.sample(range(len(new_stories)), n_like))
+                            for i, story in enumerate(new_stories):
+                                # Liked only once the story has been marked as seen
+                                self._seen_batch.append((story.id, user.pk, i in like_idx))
+                                if len(self._seen_batch) >= self.SEEN_BATCH_SIZE:
+                                    self._flush_seen()
+                                
+                                story_count += 1
+                                logger.info("Processed story by %s", user.username)
+                                
+                                if story_count >= story_limit:
+                                    break
+                            else:
+                                # Not cut short by the limit, so skip this user for a while
+                                self._checked_users.append(user.pk)
+                                    
+                        except (LoginRequired, ChallengeRequired, ClientConnectionError):
+                            raise  # Handled by safe_action
+                        except Exception as e:
+                            logger.warning("Error processing stories for %s: %s", user.username, e)
+                            self._handle_retry(delay=300)  # Retry after 5 minutes
                     
-                    if not self._within_limit('story_views', story_count):
-                        break
-                        
-            except Exception as e:
-                print(f"Error processing stories for {user.username}: {e}")
-                self._handle_retry(delay=300)  # Retry after 5 minutes
+                    for future in futures:
+                        future.cancel()  # Drop fetches that are no longer needed
+                
+                self._flush_seen()  # Mark any remaining queued stories as seen
+            finally:
+                self._seen_batch = []  # Untracked leftovers are viewed again next cycle
+                self._checked_users = []
+                self._rejected_users = set()
+                self._save_story_fetches()
                 
     @safe_action
     def engage_feed(self) -> None:
         """Interact with feed posts while avoiding duplicates"""
-        feed = self.cl.user_medias(self.cl.user_id, amount=self.limits['likes'])
+        like_limit = self.limits['likes']
+        comment_limit = self.limits['comments']
+        feed = self._iter_medias(like_limit)
         like_count = 0
         comment_count = 0
         
         for post in feed:
+            if self._stop.is_set():
+                break
             if post.id in self.liked_posts:
                 continue
                 
-            if self._within_limit('likes', like_count):
-                self.cl.media_like(post.id)
-                self.liked_posts.add(post.id)
+            if like_count < like_limit:
+                self._call('media_like', self.cl.media_like, post.id)
+                self._track('liked_posts', post.id)
                 like_count += 1
-                print(f"Liked post by {post.user.username}")
+                logger.info("Liked post by %s", post.user.username)
                 
-            if (self._within_limit('comments', comment_count) 
+            if (comment_count < comment_limit
                 and post.id not in self.commented_posts
-                and random.random() < 0.3):  # 30% chance to comment
+                and self._rng.random() < 0.3):  # 30% chance to comment
                 
-                comments = ["Great content!", "Well done!", "Awesome post!"]
-                self.cl.media_comment(post.id, random.choice(comments))
-                self.commented_posts.add(post.id)
+                self._call(
+                    'media_comment', self.cl.media_comment, post.id, self._rng.choice(self._COMMENTS)
+                )
+                self._track('commented_posts', post.id)
                 comment_count += 1
-                print(f"Commented on post by {post.user.username}")
+                logger.info("Commented on post by %s", post.user.username)
+            
+            # Both quotas used up: skip the remaining posts and any further pages
+            if like_count >= like_limit and comment_count >= comment_limit:
+                break
                 
     def execute_cycle(self) -> None:
         """Execute complete engagement cycle"""
-        print("\n--- Starting engagement cycle ---")
-        print(f"Current time: {datetime.now(self.timezone).strftime('%Y-%m-%d %H:%M:%S')}")
+        logger.info("\n--- Starting engagement cycle ---")
+        logger.info("Current time: %s", datetime.now(self.timezone).strftime(self._TIME_FMT))
         self.handle_stories()
         self.engage_feed()
-        print("--- Cycle completed successfully ---\n")
+        logger.info("--- Cycle completed successfully ---\n")
+        
+    def _request_stop(self, signum, frame) -> None:
+        """Signal handler: finish the current step, then leave the run loop"""
+        logger.info("Shutdown requested, stopping after the current step...")
+        self._stop.set()
         
     def run(self) -> None:
         """Main execution loop"""
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self._request_stop)
         self.authenticate()
         
-        while True:
+        while not self._stop.is_set():
+            # Schedule from the cycle start so the period doesn't drift with cycle runtime
+            next_wakeup = time.monotonic() + self.CYCLE_INTERVAL
             try:
                 self.execute_cycle()
             except Exception as e:
-                print(f"Error during engagement cycle: {e}")
+                logger.error("Error during engagement cycle: %s", e)
                 self._handle_retry()
             
-            delay = 1800  # 30 minutes
+            delay = max(0.0, next_wakeup - time.monotonic())
             next_run = datetime.now(self.timezone) + timedelta(seconds=delay)
-            print(f"Next cycle at {next_run.strftime('%H:%M:%S')}")
-            time.sleep(delay)
+            logger.info("Next cycle at %s", next_run.strftime('%H:%M:%S'))
+            _log_buffer.flush()  # Don't hold this cycle's output back while idle
+            self._stop.wait(delay)
+        
+        self._flush_trackers()
+        logger.info("Bot stopped.")
 
 if __name__ == "__main__":
     bot = InstagramBot()